@@ -3,14 +3,21 @@ import os
 from typing import List, Dict
 import traceback
 import re
+import hashlib
+import shutil
+from pathlib import Path
 # Import our custom modules
 from config import CONFIG
-from document_processor import DocumentProcessor
+from document_processor import get_document_processor
 from chatbot import ChatBot
-from conversational_form import ConversationalForm
-from tool_agents import ToolAgents
+from conversational_form import get_conversational_form
+from tool_agents import ToolAgents, get_tool_agents
 import logging
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from logging.handlers import QueueHandler, QueueListener
+import queue
+import atexit
 import logging
 
 
@@ -22,11 +29,18 @@ if not logging.getLogger().handlers:
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     log_filename = f"logs/{timestamp}.log"
     
+    # Disk writes happen on the listener thread, off the request path.
+    # Records arrive already formatted by the QueueHandler.
+    log_queue = queue.Queue(-1)
+    log_listener = QueueListener(log_queue, logging.FileHandler(log_filename))
+    log_listener.start()
+    atexit.register(log_listener.stop)
+    
     logging.basicConfig(
-        level=logging.DEBUG,
+        level=os.getenv("LOG_LEVEL", "INFO").upper(),
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
         handlers=[
-            logging.FileHandler(log_filename),
+            QueueHandler(log_queue),
             logging.StreamHandler()
         ]
     )
@@ -49,20 +63,6 @@ st.markdown("""
     .stAlert {
         margin-top: 1rem;
     }
-    .chat-message {
-        padding: 1rem;
-        border-radius: 0.5rem;
-        margin-bottom: 1rem;
-        border: 1px solid #e0e0e0;
-    }
-    .user-message {
-        background-color: #0000FF;
-        margin-left: 2rem;
-    }
-    .assistant-message {
-        background-color: #000000;
-        margin-right: 2rem;
-    }
     .form-progress {
         background-color: #e8f4fd;
         padding: 0.5rem;
@@ -74,26 +74,40 @@ st.markdown("""
 
 def initialize_session_state():
     """Initialize session state variables"""
+    if not st.session_state.setdefault("_dirs_ready", False):
+        for path in (CONFIG["VECTOR_STORE_PATH"], CONFIG["UPLOADED_DOCS_PATH"], CONFIG["PARSE_CACHE_PATH"]):
+            Path(path).mkdir(parents=True, exist_ok=True)
+        st.session_state._dirs_ready = True
+    
     if "messages" not in st.session_state:
         st.session_state.messages = []
     
     if "document_processor" not in st.session_state:
-        st.session_state.document_processor = DocumentProcessor()
+        st.session_state.document_processor = get_document_processor()
     
     if "chatbot" not in st.session_state:
         st.session_state.chatbot = ChatBot(st.session_state.document_processor)
     
     if "conversational_form" not in st.session_state:
-        st.session_state.conversational_form = ConversationalForm()
+        st.session_state.conversational_form = get_conversational_form()
     
     if "tool_agents" not in st.session_state:
-        st.session_state.tool_agents = ToolAgents(st.session_state.conversational_form)
+        try:
+            st.session_state.tool_agents = get_tool_agents()
+        except RuntimeError as e:
+            # Nothing was cached; this session runs without the agent and the next one retries
+            logger.warning(f"Shared tool agents unavailable: {str(e)}")
+            st.session_state.tool_agents = ToolAgents(st.session_state.conversational_form)
     
     if "collecting_form" not in st.session_state:
         st.session_state.collecting_form = False
     
     if "completed_forms" not in st.session_state:
         st.session_state.completed_forms = []
+    
+    # get_document_processor() has already loaded the model; run its first forward passes and
+    # fill the query cache in the background (no-op after the first session)
+    st.session_state.document_processor.start_warmup(CONFIG["WARMUP_QUERIES"])
 
 
 
@@ -110,13 +124,10 @@ def display_document_upload():
             return
         
         # Check current vector store status more reliably
-        vector_store_exists = False
-        if hasattr(st.session_state, 'document_processor'):
-            vector_store = st.session_state.document_processor.get_vector_store()
-            vector_store_exists = vector_store is not None
-            
-            # Sync the session state with actual vector store status
-            st.session_state.vector_store_loaded = vector_store_exists
+        vector_store_exists = st.session_state.document_processor.get_vector_store() is not None
+        
+        # Sync the session state with actual vector store status
+        st.session_state.vector_store_loaded = vector_store_exists
         
         # Display current status with more detailed information
         if vector_store_exists:
@@ -223,6 +234,15 @@ def display_document_upload():
             - Processing time depends on file size and content
             """)
 
+def save_uploaded_file(uploaded_file, upload_dir: str) -> str:
+    """Write a single uploaded file to the upload directory"""
+    file_path = os.path.join(upload_dir, uploaded_file.name)
+    uploaded_file.seek(0)
+    with open(file_path, "wb") as f:
+        # Copy in 1 MiB chunks instead of materializing the whole upload
+        shutil.copyfileobj(uploaded_file, f, length=1 << 20)
+    return file_path
+
 def process_documents(uploaded_files):
     """Process uploaded documents with comprehensive error handling and user feedback"""
     # Create progress indicators
@@ -234,42 +254,67 @@ def process_documents(uploaded_files):
         status_text.text("🔧 Setting up processing...")
         progress_bar.progress(10)
         
-        # Ensure upload directory exists
-        upload_dir = CONFIG.get("UPLOADED_DOCS_PATH", "uploaded_docs")
-        os.makedirs(upload_dir, exist_ok=True)
-        logger.info(f"Upload directory ready: {upload_dir}")
+        # Upload directory is created in initialize_session_state
+        upload_dir = CONFIG["UPLOADED_DOCS_PATH"]
+        
+        if "document_processor" not in st.session_state:
+            st.error("❌ Document processor not available. Please restart the application.")
+            return False
+        
+        # Files parsed in an earlier upload are reused by content hash
+        documents = []
+        new_files = []
+        digests = []
+        for uploaded_file in uploaded_files:
+            digest = hashlib.blake2b(uploaded_file.getbuffer(), digest_size=16).hexdigest()
+            cached_documents = st.session_state.document_processor.get_cached_documents(
+                digest, source=os.path.join(upload_dir, uploaded_file.name)
+            )
+            if cached_documents is not None:
+                logger.info(f"Reusing parsed content of {uploaded_file.name}")
+                documents.extend(cached_documents)
+            else:
+                new_files.append(uploaded_file)
+                digests.append(digest)
         
         # Step 2: Save files (30%)
         status_text.text("💾 Saving uploaded files...")
         progress_bar.progress(30)
         
-        file_paths = []
-        for i, uploaded_file in enumerate(uploaded_files):
-            try:
-                file_path = os.path.join(upload_dir, uploaded_file.name)
-                with open(file_path, "wb") as f:
-                    f.write(uploaded_file.getbuffer())
-                file_paths.append(file_path)
-                logger.info(f"Saved file: {file_path}")
-                
-                # Update progress for each file
-                step_progress = 30 + (20 * (i + 1) / len(uploaded_files))
-                progress_bar.progress(int(step_progress))
-                
-            except Exception as e:
-                logger.error(f"Error saving file {uploaded_file.name}: {str(e)}")
-                st.error(f"❌ Failed to save {uploaded_file.name}: {str(e)}")
-                return False
+        # Files are written concurrently; progress is updated here on the script thread
+        saved_paths = [None] * len(new_files)
+        save_failed = False
+        if new_files:
+            with ThreadPoolExecutor(max_workers=min(8, len(new_files))) as executor:
+                futures = {
+                    executor.submit(save_uploaded_file, uploaded_file, upload_dir): i
+                    for i, uploaded_file in enumerate(new_files)
+                }
+                for done, future in enumerate(as_completed(futures), 1):
+                    index = futures[future]
+                    try:
+                        saved_paths[index] = future.result()
+                        logger.info(f"Saved file: {saved_paths[index]}")
+                    except Exception as e:
+                        logger.error(f"Error saving file {new_files[index].name}: {str(e)}")
+                        st.error(f"❌ Failed to save {new_files[index].name}: {str(e)}")
+                        save_failed = True
+                    
+                    # Update progress for each file
+                    step_progress = 30 + (20 * done / len(new_files))
+                    progress_bar.progress(int(step_progress))
+        
+        file_paths = [path for path in saved_paths if path]
+        if save_failed:
+            return False
         
         # Step 3: Load documents (60%)
         status_text.text("📖 Loading and parsing documents...")
         progress_bar.progress(60)
         
-        if not hasattr(st.session_state, 'document_processor'):
-            st.error("❌ Document processor not available. Please restart the application.")
-            return False
-        
-        documents = st.session_state.document_processor.load_documents(file_paths)
+        documents.extend(
+            st.session_state.document_processor.load_documents(file_paths, cache_keys=digests)
+        )
         
         if not documents:
             st.error("❌ No valid documents were loaded. Please check your files and try again.")
@@ -292,7 +337,7 @@ def process_documents(uploaded_files):
         progress_bar.progress(100)
         
         # Update chatbot if available
-        if hasattr(st.session_state, 'chatbot'):
+        if "chatbot" in st.session_state:
             try:
                 st.session_state.chatbot.update_documents()
                 logger.info("Chatbot updated with new documents")
@@ -370,23 +415,15 @@ def display_completed_appointments():
 def display_chat_messages():
     """Display chat messages"""
     for message in st.session_state.messages:
-        role = message["role"]
-        content = message["content"]
-        
-        if role == "user":
-            st.markdown(f"""
-            <div class="chat-message user-message">
-                <strong>You:</strong><br>
-                {content}
-            </div>
-            """, unsafe_allow_html=True)
-        else:
-            st.markdown(f"""
-            <div class="chat-message assistant-message">
-                <strong>Assistant:</strong><br>
-                {content}
-            </div>
-            """, unsafe_allow_html=True)
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+            
+            # Previews are built once when the answer is produced
+            if message.get("sources"):
+                with st.expander("📚 Source Documents"):
+                    for i, preview in enumerate(message["sources"]):
+                        st.write(f"**Source {i+1}:**")
+                        st.write(preview)
 
 def process_user_input(user_input: str):
     """Process user input with better routing logic"""
@@ -397,16 +434,19 @@ def process_user_input(user_input: str):
     st.session_state.messages.append({"role": "user", "content": user_input})
     
     try:
-        # Determine processing method
-        should_use_agent = (
-            st.session_state.tool_agents.should_use_agent(user_input) or 
-            st.session_state.conversational_form.is_form_active()
-        )
+        sources = []
+        
+        # Determine processing method; should_use_agent covers an active form and the
+        # cached keyword check, so RAG questions never reach the agent's LLM
+        should_use_agent = st.session_state.tool_agents.should_use_agent(user_input)
         
         if should_use_agent:
             logger.info("Using tool agents for processing")
-            result = st.session_state.tool_agents.process_with_agent(user_input)
-            response = result["response"]
+            # Show the exchange while the agent runs; the rerun afterwards redraws it from history
+            with st.chat_message("user"):
+                st.markdown(user_input)
+            with st.chat_message("assistant"):
+                response = st.write_stream(st.session_state.tool_agents.stream_with_agent(user_input))
             
         else:
             logger.info("Using regular chatbot for processing")
@@ -416,15 +456,11 @@ def process_user_input(user_input: str):
             )
             response = result["response"]
             
-            # Display source documents if available
-            if result.get("source_documents"):
-                with st.expander("📚 Source Documents"):
-                    for i, doc in enumerate(result["source_documents"]):
-                        st.write(f"**Source {i+1}:**")
-                        st.write(doc.page_content[:200] + "...")
+            # Keep short previews of the source documents with the answer
+            sources = [doc.page_content[:200] + "..." for doc in result.get("source_documents", [])]
         
         # Add assistant response
-        st.session_state.messages.append({"role": "assistant", "content": response})
+        st.session_state.messages.append({"role": "assistant", "content": response, "sources": sources})
         
     except Exception as e:
         logger.error(f"Error processing user input: {str(e)}", exc_info=True)
@@ -1,34 +1,75 @@
 from langchain.prompts import ChatPromptTemplate
-from langchain_groq import ChatGroq
 from config import CONFIG
+from llm import get_llm
 from document_processor import DocumentProcessor
-from langchain.memory.buffer_window import ConversationBufferWindowMemory
+from semantic_cache import SemanticCache
+from langchain.memory.summary_buffer import ConversationSummaryBufferMemory
 from langchain.chains.conversational_retrieval.base import ConversationalRetrievalChain
 from langchain_core.retrievers import BaseRetriever
 from typing import List, Dict, Any, Optional
 import streamlit as st
 import logging
+from validators import CALL_REQUEST_RE
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 
+
+@st.cache_resource
+def get_semantic_cache(_embeddings, threshold: float, max_size: int, ttl: float) -> SemanticCache:
+    """Answer cache shared by all sessions, like the document index the answers come from"""
+    return SemanticCache(_embeddings, threshold=threshold, max_size=max_size, ttl=ttl)
+
+
+def _approx_tokens(messages) -> int:
+    """Rough token count at about four characters per token, without a tokenizer download"""
+    return sum(len(str(message.content)) for message in messages) // 4
+
+
+class _SummaryBufferMemory(ConversationSummaryBufferMemory):
+    """Summary buffer memory with a local token estimate and infrequent summarization"""
+    def prune(self) -> None:
+        """Fold the oldest turns into the summary once the buffer exceeds the token limit"""
+        buffer = self.chat_memory.messages
+        if _approx_tokens(buffer) <= self.max_token_limit:
+            return
+        # Trim to half the limit so the extra summarization LLM call happens every few
+        # turns rather than on every turn once the buffer is full
+        pruned_memory = []
+        while buffer and _approx_tokens(buffer) > self.max_token_limit // 2:
+            pruned_memory.append(buffer.pop(0))
+        self.moving_summary_buffer = self.predict_new_summary(
+            pruned_memory, self.moving_summary_buffer
+        )
+
+
 class ChatBot:
     """Main chatbot class that handles conversations and document queries"""
     def __init__(self, document_processor: DocumentProcessor):
         logger.info("Initializing ChatBot")
-        self.llm = ChatGroq(
-            groq_api_key=CONFIG["GROQ_API_KEY"],
-            model=CONFIG["MODEL_NAME"],
-            temperature=CONFIG["TEMPERATURE"],
+        self.llm = get_llm(
+            CONFIG["MODEL_NAME"],
+            CONFIG["TEMPERATURE"],
+            CONFIG["GROQ_API_KEY"],
         )
         self.document_processor = document_processor
-        self.memory = ConversationBufferWindowMemory(
+        # Older turns are folded into a rolling summary to bound prompt tokens
+        self.memory = _SummaryBufferMemory(
+            llm=self.llm,
+            max_token_limit=CONFIG["MEMORY_MAX_TOKENS"],
             memory_key="chat_history",
             return_messages=True,
-            output_key="answer",
-            k=5  # Keep last 5 exchanges
+            output_key="answer"
         )
         logger.debug("Initialized conversation memory")
+        self.semantic_cache = None
+        if CONFIG["SEMANTIC_CACHE_ENABLED"]:
+            self.semantic_cache = get_semantic_cache(
+                document_processor.embeddings,
+                CONFIG["SEMANTIC_CACHE_THRESHOLD"],
+                CONFIG["SEMANTIC_CACHE_MAX_SIZE"],
+                CONFIG["SEMANTIC_CACHE_TTL"]
+            )
         self.qa_chain = None
         self.setup_qa_chain()
     
@@ -41,12 +82,18 @@ class ChatBot:
             logger.debug("Vector store available, creating QA chain")
             self.qa_chain = ConversationalRetrievalChain.from_llm(
                 llm=self.llm,
-                retriever=vector_store.as_retriever(search_kwargs={"k": 4}),
+                retriever=vector_store.as_retriever(
+                    search_type="mmr",
+                    search_kwargs={
+                        "k": CONFIG["RETRIEVER_K"],
+                        "fetch_k": CONFIG["RETRIEVER_FETCH_K"],
+                        "lambda_mult": CONFIG["RETRIEVER_LAMBDA_MULT"]
+                    }
+                ),
                 memory=self.memory,
                 return_source_documents=True,
                 output_key="answer",
-                verbose=True,
-
+                verbose=False,
             )
             logger.info("QA chain initialized successfully")
         else:
@@ -55,22 +102,15 @@ class ChatBot:
     
     def detect_call_request(self, message: str) -> bool:
         """Detect if user is requesting a call/appointment"""
-        logger.debug(f"Detecting call request in message: {message[:50]}...")
-        call_keywords = [
-            'call me', 'call back', 'schedule call', 'book appointment',
-            'appointment', 'meeting', 'talk to someone', 'speak with',
-            'contact me', 'get in touch', 'schedule meeting'
-        ]
-        
-        message_lower = message.lower()
-        detected = any(keyword in message_lower for keyword in call_keywords)
-        logger.debug(f"Call request detected: {detected}")
+        logger.debug("Detecting call request in message: %s...", message[:50])
+        detected = CALL_REQUEST_RE.search(message) is not None
+        logger.debug("Call request detected: %s", detected)
         return detected
     
 
     def get_response(self, message: str, chat_history: List[Dict]) -> Dict[str, Any]:
         """Get response from the chatbot with improved logic"""
-        logger.info(f"Processing message: {message[:100]}...")
+        logger.info("Processing message: %s...", message[:100])
         
         # Don't process call requests here - let tool agents handle them
         # This prevents random tool activation
@@ -78,6 +118,17 @@ class ChatBot:
         # Use QA chain if available and not a call request
         if self.qa_chain and not self.detect_call_request(message):
             try:
+                # Only standalone questions are cached; with history, "tell me more"
+                # depends on the earlier turns and must go through the chain
+                query_vector = None
+                if self.semantic_cache and self._is_standalone():
+                    query_vector = self.semantic_cache.embed(message)
+                    cached = self.semantic_cache.lookup(query_vector)
+                    if cached:
+                        # Record the turn so follow-up questions are condensed with it
+                        self.memory.save_context({"question": message}, {"answer": cached["response"]})
+                        return cached
+
                 logger.debug("Using QA chain for response")
                 formatted_history = self._format_chat_history(chat_history)
                 
@@ -87,14 +138,17 @@ class ChatBot:
                 })
                 
                 logger.debug("QA chain response generated")
-                return {
+                response = {
                     "response": result["answer"],
                     "requires_form": False,
                     "source_documents": result.get("source_documents", [])
                 }
+                if query_vector is not None:
+                    self.semantic_cache.add(query_vector, response)
+                return response
                 
             except Exception as e:
-                logger.error(f"QA chain error: {str(e)}", exc_info=True)
+                logger.error("QA chain error: %s", e, exc_info=True)
                 # Fall through to direct LLM response
         
         # Fallback to direct LLM response
@@ -110,7 +164,7 @@ class ChatBot:
             }
             
         except Exception as e:
-            logger.error(f"Direct LLM error: {str(e)}", exc_info=True)
+            logger.error("Direct LLM error: %s", e, exc_info=True)
             return {
                 "response": "I apologize, but I'm having trouble processing your request right now. Please try again.",
                 "requires_form": False,
@@ -125,7 +179,7 @@ class ChatBot:
         context = ""
         if chat_history:
             recent_history = chat_history[-3:]  # Last 3 exchanges
-            logger.debug(f"Using {len(recent_history)} history items for context")
+            logger.debug("Using %d history items for context", len(recent_history))
             for chat in recent_history:
                 role = "Human" if chat["role"] == "user" else "Assistant"
                 context += f"{role}: {chat['content']}\n"
@@ -138,27 +192,28 @@ class ChatBot:
                 Current question: {message}
 
                 Please provide a helpful response:"""
-        logger.debug(f"Constructed prompt length: {len(prompt)} characters")
+        logger.debug("Constructed prompt length: %d characters", len(prompt))
         
         return prompt
 
+    def _is_standalone(self) -> bool:
+        """True when the conversation memory is empty, so the question needs no earlier context"""
+        return not self.memory.chat_memory.messages and not self.memory.moving_summary_buffer
+    
     def update_documents(self):
         """Update the QA chain when new documents are added"""
         logger.info("Updating documents and resetting QA chain")
+        if self.semantic_cache:
+            # Cached answers refer to the old documents
+            self.semantic_cache.clear()
         self.setup_qa_chain()
     
     def _format_chat_history(self, chat_history: List[Dict]) -> List[tuple]:
         """Format chat history for the chain"""
         logger.debug("Formatting chat history")
-        formatted_history = []
-        for chat in chat_history[-5:]:  # Keep last 5 exchanges
-            if chat["role"] == "user":
-                user_msg = chat["content"]
-            elif chat["role"] == "assistant":
-                assistant_msg = chat["content"]
-                if user_msg and assistant_msg:
-                    formatted_history.append((user_msg, assistant_msg))
-                    user_msg = None
-                    assistant_msg = None
-        logger.debug(f"Formatted history contains {len(formatted_history)} QA pairs")
+        recent_history = chat_history[-10:]
+        user_messages = [chat["content"] for chat in recent_history if chat["role"] == "user"]
+        assistant_messages = [chat["content"] for chat in recent_history if chat["role"] == "assistant"]
+        formatted_history = list(zip(user_messages, assistant_messages))[-5:]  # Keep last 5 exchanges
+        logger.debug("Formatted history contains %d QA pairs", len(formatted_history))
         return formatted_history
\ No newline at end of file
@@ -10,14 +10,38 @@ CONFIG = {
     "GROQ_API_KEY": os.getenv("GROQ_API_KEY"),
     "MODEL_NAME": "llama-3.3-70b-versatile",
     "EMBEDDING_MODEL": "sentence-transformers/all-mpnet-base-v2",
+    "EMBEDDING_DEVICE": None,  # None picks cuda, then mps, then cpu
+    "EMBEDDING_BATCH_SIZE": 64,
     "CHUNK_SIZE": 1000,
     "CHUNK_OVERLAP": 200,
+    "RETRIEVER_K": 3,
+    "RETRIEVER_FETCH_K": 12,
+    "RETRIEVER_LAMBDA_MULT": 0.5,
     "MAX_TOKENS": 4000,
     "TEMPERATURE": 0.3,
+    "MEMORY_MAX_TOKENS": 2000,
     "VECTOR_STORE_PATH": "./vector_store",
-    "UPLOADED_DOCS_PATH": "./uploaded_docs"
-}
-
-# Create directories if they don't exist
-os.makedirs(CONFIG["VECTOR_STORE_PATH"], exist_ok=True)
-os.makedirs(CONFIG["UPLOADED_DOCS_PATH"], exist_ok=True)
\ No newline at end of file
+    "UPLOADED_DOCS_PATH": "./uploaded_docs",
+    "PARSE_CACHE_PATH": "./vector_store/parse_cache",
+    "PARSE_CACHE_MAX_ENTRIES": 200,
+    "WEAVIATE_BATCH_SIZE": 100,
+    "HNSW_EF_CONSTRUCTION": 200,
+    "HNSW_MAX_CONNECTIONS": 32,
+    "HNSW_EF": 64,
+    "VECTOR_COMPRESSION": "pq",  # "pq", "sq" (int8, Weaviate >= 1.26) or None
+    "VECTOR_COMPRESSION_MIN_OBJECTS": 10000,
+    "AGENT_MAX_ITERATIONS": 6,
+    "AGENT_MAX_EXECUTION_TIME": 20,  # seconds
+    "AGENT_MAX_CONCURRENCY": 8,
+    "QUERY_EMBEDDING_CACHE_SIZE": 1024,
+    "SEARCH_CACHE_SIZE": 256,
+    "SEMANTIC_CACHE_ENABLED": True,
+    "SEMANTIC_CACHE_THRESHOLD": 0.92,
+    "SEMANTIC_CACHE_MAX_SIZE": 256,
+    "SEMANTIC_CACHE_TTL": 3600,
+    "WARMUP_QUERIES": [
+        "What is this document about?",
+        "Summarize the document",
+        "What are the key points?"
+    ]
+}
\ No newline at end of file
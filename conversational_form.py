@@ -3,55 +3,82 @@ from typing import Dict, Any, Optional
 from datetime import datetime
 from validators import FormValidator, DateExtractor
 import logging
+import re
 logger = logging.getLogger(__name__)
 
+_FORM_STEPS = ("name", "email", "phone", "date", "confirmation")
+_NEXT_STEP = dict(zip(_FORM_STEPS, _FORM_STEPS[1:]))
+_STEP_INDEX = {step: i for i, step in enumerate(_FORM_STEPS)}
+
+# Confirmation replies are matched as whole words ("yesterday" is not "yes")
+_WORD_RE = re.compile(r"[a-z]+")
+_YES = frozenset({"yes", "correct", "confirm", "y"})
+_NO = frozenset({"no", "incorrect", "wrong", "n"})
+
+_CONFIRM_TMPL = "\n".join([
+    "Perfect! Let me confirm your information:",
+    "",
+    "📝 **Contact Information:**",
+    "• **Name:** {name}",
+    "• **Email:** {email}",
+    "• **Phone:** {phone}",
+    "• **Preferred Call Date:** {formatted_date}",
+    "",
+    "Is this information correct? Please reply with 'yes' to confirm or 'no' to make changes."
+])
+
+_SUCCESS_TMPL = "\n".join([
+    "✅ **Appointment Request Confirmed!**",
+    "",
+    "Thank you, {name}! We have successfully recorded your information:",
+    "",
+    "• **Name:** {name}",
+    "• **Email:** {email}",
+    "• **Phone:** {phone}",
+    "• **Preferred Date:** {formatted_date}",
+    "",
+    "Someone from our team will contact you at {phone} on or before {formatted_date} to schedule your call.",
+    "",
+    "You should also receive a confirmation email at {email} shortly.",
+    "",
+    "Is there anything else I can help you with today?"
+])
+
 class ConversationalForm:
     """Handles conversational form collection for user information"""
     def __init__(self):
         self.validator = FormValidator()
         self.date_extractor = DateExtractor()
-        self.form_steps = [
-            "name",
-            "email", 
-            "phone",
-            "date",
-            "confirmation"
-        ]
+        self.form_steps = _FORM_STEPS
+        self._handlers = {
+            "name": self._process_name,
+            "email": self._process_email,
+            "phone": self._process_phone,
+            "date": self._process_date,
+            "confirmation": self._process_confirmation
+        }
         logger.debug("Initialized ConversationalForm with steps: %s", self.form_steps)
 
 
     def get_current_step(self) -> str:
         """Get the current form step"""
-        logger.debug("Current form step: %s", st.session_state.get("form_step", "name"))
-        return st.session_state.get("form_step", "name")
+        current_step = st.session_state.get("form_step", "name")
+        logger.debug("Current form step: %s", current_step)
+        return current_step
     
     def get_next_step(self, current_step: str) -> Optional[str]:
         """Get the next step in the form"""
-        try:
-            current_index = self.form_steps.index(current_step)
-            if current_index < len(self.form_steps) - 1:
-                return self.form_steps[current_index + 1]
-        except ValueError:
-            pass
-        return None
+        return _NEXT_STEP.get(current_step)
     
     def process_form_input(self, user_input: str) -> Dict[str, Any]:
         """Process user input for the current form step"""
-        logger.info("Processing input for step '%s': %s", self.get_current_step(), user_input)
         current_step = self.get_current_step()
+        logger.info("Processing input for step '%s': %s", current_step, user_input)
         
-        if current_step == "name":
-            return self._process_name(user_input)
-        elif current_step == "email":
-            return self._process_email(user_input)
-        elif current_step == "phone":
-            return self._process_phone(user_input)
-        elif current_step == "date":
-            return self._process_date(user_input)
-        elif current_step == "confirmation":
-            return self._process_confirmation(user_input)
-        else:
+        handler = self._handlers.get(current_step)
+        if handler is None:
             return self._handle_unknown_step()
+        return handler(user_input)
     
     def _process_name(self, user_input: str) -> Dict[str, Any]:
         """Process name input"""
@@ -60,13 +87,13 @@ class ConversationalForm:
         
         if is_valid:
             logger.info("Valid name received: %s", user_input)
-            st.session_state.form_data = st.session_state.get("form_data", {})
-            st.session_state.form_data["name"] = user_input.strip().title()
+            name = user_input.strip().title()
+            self._form_data()["name"] = name
             st.session_state.form_step = "email"
             logger.debug("Transitioning to email step")
             
             return {
-                "response": f"Great! Nice to meet you, {user_input.strip().title()}. Now, could you please provide your email address?",
+                "response": f"Great! Nice to meet you, {name}. Now, could you please provide your email address?",
                 "form_completed": False,
                 "needs_input": True
             }
@@ -84,7 +111,7 @@ class ConversationalForm:
         is_valid, message = self.validator.validate_email(user_input)
         
         if is_valid:
-            st.session_state.form_data["email"] = user_input.strip().lower()
+            self._form_data()["email"] = user_input.strip().lower()
             st.session_state.form_step = "phone"
             logger.debug("Transitioning to Phone step")
             
@@ -109,7 +136,7 @@ class ConversationalForm:
         if is_valid:
             # Extract the formatted phone number from the message
             formatted_phone = message.split(": ")[-1] if ": " in message else user_input
-            st.session_state.form_data["phone"] = formatted_phone
+            self._form_data()["phone"] = formatted_phone
             st.session_state.form_step = "date"
             logger.debug("Transitioning to date step")
             
@@ -133,33 +160,26 @@ class ConversationalForm:
         
         if extracted_date:
             # Parse and format the date nicely
+            logger.info("Date extracted: %s", extracted_date)
             try:
-                logger.info("Date extracted: %s", extracted_date)
-                date_obj = datetime.strptime(extracted_date, "%Y-%m-%d")
+                date_obj = datetime.fromisoformat(extracted_date)
+            except ValueError:
+                logger.warning("Invalid date input: %s", user_input)
+            else:
                 formatted_date = date_obj.strftime("%A, %B %d, %Y")
                 
-                st.session_state.form_data["date"] = extracted_date
-                st.session_state.form_data["formatted_date"] = formatted_date
+                form_data = self._form_data()
+                form_data["date"] = extracted_date
+                form_data["formatted_date"] = formatted_date
                 st.session_state.form_step = "confirmation"
                 logger.debug("Transitioning to confirmation step")
                 
                 # Show confirmation
-                form_data = st.session_state.form_data
                 return {
-                    "response": f"""Perfect! Let me confirm your information:
-
-                    📝 **Contact Information:**
-                    • **Name:** {form_data['name']}
-                    • **Email:** {form_data['email']}
-                    • **Phone:** {form_data['phone']}
-                    • **Preferred Call Date:** {formatted_date}
-
-                    Is this information correct? Please reply with 'yes' to confirm or 'no' to make changes.""",
-                                        "form_completed": False,
-                                        "needs_input": True
-                                    }
-            except:
-                logger.warning("Invalid  input: %s ", user_input)
+                    "response": _CONFIRM_TMPL.format(**form_data),
+                    "form_completed": False,
+                    "needs_input": True
+                }
         
         return {
             "response": "I couldn't understand that date. Please try again with something like 'tomorrow', 'next Monday', or a specific date like '2024-01-15'.",
@@ -170,17 +190,14 @@ class ConversationalForm:
     def _process_confirmation(self, user_input: str) -> Dict[str, Any]:
         """Process confirmation input"""
         logger.debug("Process confirmation for : %s", user_input)
-        user_input_lower = user_input.lower().strip()
+        tokens = set(_WORD_RE.findall(user_input.lower()))
         
-        if any(word in user_input_lower for word in ['yes', 'correct', 'confirm', 'y']):
+        if tokens & _YES:
             # Form completed successfully
-            form_data = st.session_state.form_data
+            form_data = self._form_data()
             
             # Save to session state for potential future use
-            if "completed_forms" not in st.session_state:
-                st.session_state.completed_forms = []
-            
-            st.session_state.completed_forms.append({
+            st.session_state.setdefault("completed_forms", []).append({
                 **form_data,
                 "timestamp": datetime.now().isoformat()
             })
@@ -191,25 +208,12 @@ class ConversationalForm:
             st.session_state.collecting_form = False
             
             return {
-                "response": f"""✅ **Appointment Request Confirmed!**
-
-                Thank you, {form_data['name']}! We have successfully recorded your information:
-
-                • **Name:** {form_data['name']}
-                • **Email:** {form_data['email']}
-                • **Phone:** {form_data['phone']}
-                • **Preferred Date:** {form_data['formatted_date']}
-
-                Someone from our team will contact you at {form_data['phone']} on or before {form_data['formatted_date']} to schedule your call.
-
-                You should also receive a confirmation email at {form_data['email']} shortly.
-
-                Is there anything else I can help you with today?""",
+                "response": _SUCCESS_TMPL.format(**form_data),
                 "form_completed": True,
                 "needs_input": False
             }
         
-        elif any(word in user_input_lower for word in ['no', 'incorrect', 'wrong', 'n']):
+        elif tokens & _NO:
             # User wants to make changes - restart form
             st.session_state.form_step = "name"
             st.session_state.form_data = {}
@@ -227,6 +231,10 @@ class ConversationalForm:
                 "needs_input": True
             }
     
+    def _form_data(self) -> Dict[str, Any]:
+        """Get the form data dict from session state, creating it if needed"""
+        return st.session_state.setdefault("form_data", {})
+    
     def _handle_unknown_step(self) -> Dict[str, Any]:
         """Handle unknown form step"""
         # Reset form state
@@ -268,8 +276,13 @@ class ConversationalForm:
         }
         
         if current_step in step_names:
-            current_index = self.form_steps.index(current_step)
-            progress = f"{current_index + 1}/{len(self.form_steps)}"
+            progress = f"{_STEP_INDEX[current_step] + 1}/{len(self.form_steps)}"
             return f"Step {progress}: {step_names[current_step]}"
         
-        return "Form Progress"
\ No newline at end of file
+        return "Form Progress"
+
+
+@st.cache_resource
+def get_conversational_form() -> ConversationalForm:
+    """Shared ConversationalForm; all per-user state lives in st.session_state"""
+    return ConversationalForm()
@@ -0,0 +1,26 @@
+import os
+from typing import List
+from langchain_core.documents import Document
+from langchain_community.document_loaders import PyPDFLoader, TextLoader, Docx2txtLoader
+
+# Kept free of torch and streamlit imports so parsing code stays cheap to import on its own
+
+# Loader class per lowercase file extension
+LOADERS = {
+    '.pdf': PyPDFLoader,
+    '.txt': TextLoader,
+    '.docx': Docx2txtLoader
+}
+
+
+def file_extension(file_path: str) -> str:
+    """Lowercase extension of a path, including the dot"""
+    return os.path.splitext(file_path)[1].lower()
+
+
+def load_file(file_path: str) -> List[Document]:
+    """Load one file with the loader matching its extension (runs on loader threads)"""
+    loader_cls = LOADERS.get(file_extension(file_path))
+    if loader_cls is None:
+        raise ValueError(f"Unsupported file type: {file_path}")
+    return loader_cls(file_path).load()
@@ -1,37 +1,98 @@
 import os
 import weaviate
-from weaviate.auth import AuthApiKey
 from langchain_community.vectorstores import Weaviate  # Changed from FAISS
-from langchain.embeddings import HuggingFaceEmbeddings
-from langchain.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_groq import ChatGroq
+from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
 from config import CONFIG
 import streamlit as st
 from typing import List, Optional
 from langchain_core.documents import Document
-from langchain_community.document_loaders import TextLoader
-from langchain_community.document_loaders import Docx2txtLoader
+from document_loaders import LOADERS, file_extension, load_file
+from langchain_core.embeddings import Embeddings
 import logging
-import shutil
+import torch
+import numpy as np
+import hashlib
+import threading
+import pickle
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 
+
+class CachedQueryEmbeddings(Embeddings):
+    """Embeddings wrapper that keeps an LRU cache of query vectors"""
+    def __init__(self, embeddings: Embeddings, max_size: int = 1024):
+        self.embeddings = embeddings
+        self.max_size = max_size
+        # blake2b digest of the query -> embedding, bounded regardless of query length
+        self._cache: "OrderedDict[bytes, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents without caching"""
+        return self.embeddings.embed_documents(texts)
+    
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query, reusing the vector of an identical earlier query"""
+        key = hashlib.blake2b(text.encode(), digest_size=16).digest()
+        with self._lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                return list(vector)
+        
+        vector = self.embeddings.embed_query(text)
+        with self._lock:
+            self._cache[key] = vector
+            if len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        return list(vector)
+
+
+def _embedding_device() -> str:
+    """Pick the configured device, else the fastest one available"""
+    if CONFIG["EMBEDDING_DEVICE"]:
+        return CONFIG["EMBEDDING_DEVICE"]
+    if torch.cuda.is_available():
+        return "cuda"
+    if torch.backends.mps.is_available():
+        return "mps"
+    return "cpu"
+
+
+@st.cache_resource
+def get_embeddings(model_name: str) -> CachedQueryEmbeddings:
+    """Load the sentence-transformers model once per process"""
+    device = _embedding_device()
+    logger.info("Loading embeddings model: %s on %s", model_name, device)
+    embeddings = HuggingFaceEmbeddings(
+        model_name=model_name,
+        model_kwargs={"device": device},
+        encode_kwargs={"batch_size": CONFIG["EMBEDDING_BATCH_SIZE"], "normalize_embeddings": True}
+    )
+    return CachedQueryEmbeddings(embeddings, max_size=CONFIG["QUERY_EMBEDDING_CACHE_SIZE"])
+
+
+@st.cache_resource
+def get_text_splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    """Build the text splitter once per process"""
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap
+    )
+
+
 class DocumentProcessor:
     """Handles document loading, processing, and vector store creation"""
     def __init__(self):
         logger.info("Initializing DocumentProcessor")
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=CONFIG["EMBEDDING_MODEL"],
-            model_kwargs={"device": "cpu"}
-        )
-        logger.debug(f"Loaded embeddings model: {CONFIG['EMBEDDING_MODEL']}")
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=CONFIG["CHUNK_SIZE"],
-            chunk_overlap=CONFIG["CHUNK_OVERLAP"]
-        )
-        logger.debug(f"Initialized text splitter with chunk size {CONFIG['CHUNK_SIZE']}, overlap {CONFIG['CHUNK_OVERLAP']}")
+        self.embeddings = get_embeddings(CONFIG["EMBEDDING_MODEL"])
+        logger.debug("Loaded embeddings model: %s", CONFIG['EMBEDDING_MODEL'])
+        self.text_splitter = get_text_splitter(CONFIG["CHUNK_SIZE"], CONFIG["CHUNK_OVERLAP"])
+        logger.debug("Initialized text splitter with chunk size %s, overlap %s", CONFIG['CHUNK_SIZE'], CONFIG['CHUNK_OVERLAP'])
         
         # Initialize Weaviate client using v3 style for LangChain compatibility
         self.weaviate_client = weaviate.Client(
@@ -39,41 +100,100 @@ class DocumentProcessor:
         )
         self.index_name = "DocumentIndex"
         self.vector_store = None
+        # (normalized query, k) -> search results, cleared whenever the index changes
+        self._search_cache: "OrderedDict[tuple, List[Document]]" = OrderedDict()
+        self._search_lock = threading.Lock()
+        self._warmup_started = False
         self.load_vector_store()
         
-    def load_documents(self, file_paths: List[str]) -> List[Document]:
-        """Load documents from file paths"""
-        logger.info(f"Loading documents from {len(file_paths)} files")
-        documents = []
+    def load_documents(self, file_paths: List[str], cache_keys: Optional[List[str]] = None) -> List[Document]:
+        """Load documents from file paths in input order, caching each file's pages under its cache key"""
+        cache_key_by_path = dict(zip(file_paths, cache_keys or []))
+        file_paths = self._supported_paths(file_paths)
+        if not file_paths:
+            return []
+        logger.info("Loading documents from %d files", len(file_paths))
         
-        for file_path in file_paths:
-            try:
-                logger.debug(f"Processing file: {file_path}")
-                if file_path.endswith('.pdf'):
-                    loader = PyPDFLoader(file_path)
-                    logger.debug("Initialized PDF loader")
-                elif file_path.endswith('.txt'):
-                    loader = TextLoader(file_path)
-                    logger.debug("Initialized Text loader")
-                elif file_path.endswith('.docx'):
-                    loader = Docx2txtLoader(file_path)
-                    logger.debug("Initialized DOCX loader")
-                else:
-                    logger.warning(f"Unsupported file type: {file_path}")
-                    st.warning(f"Unsupported file type: {file_path}")
-                    continue
-                
-                docs = loader.load()
-                logger.info(f"Loaded {len(docs)} documents from {file_path}")
-                documents.extend(docs)
-                
-            except Exception as e:
-                logger.error(f"Error loading {file_path}: {str(e)}", exc_info=True)
-                print(f"DEBUG: Error loading {file_path}:{str(e)} ")
-                st.error(f"Error loading {file_path}: {str(e)}")
+        # Loaders spend most of their time in file I/O and C extensions, so a few threads
+        # overlap parsing without worker processes re-importing the app
+        executor = ThreadPoolExecutor(max_workers=min(8, len(file_paths)))
+        
+        # Results are consumed here in input order so st messages stay on the script thread
+        documents = []
+        with executor:
+            futures = [executor.submit(load_file, file_path) for file_path in file_paths]
+            for file_path, future in zip(file_paths, futures):
+                try:
+                    docs = future.result()
+                    logger.info("Loaded %d documents from %s", len(docs), file_path)
+                    documents.extend(docs)
+                    self.cache_documents(cache_key_by_path.get(file_path), docs)
+                except Exception as e:
+                    logger.error("Error loading %s: %s", file_path, e, exc_info=True)
+                    st.error(f"Error loading {file_path}: {str(e)}")
         
         return documents
     
+    def get_cached_documents(self, cache_key: str, source: Optional[str] = None) -> Optional[List[Document]]:
+        """Return previously parsed documents for a cache key, if any, attributed to the current source"""
+        cache_path = os.path.join(CONFIG["PARSE_CACHE_PATH"], f"{cache_key}.pkl")
+        if not os.path.exists(cache_path):
+            return None
+        try:
+            with open(cache_path, "rb") as f:
+                docs = pickle.load(f)
+            # Same content may come back under another file name
+            if source:
+                for doc in docs:
+                    doc.metadata["source"] = source
+            # Refresh the mtime so eviction drops the least recently used entries
+            os.utime(cache_path)
+            logger.debug("Loaded %d cached documents for %s", len(docs), cache_key)
+            return docs
+        except Exception as e:
+            logger.warning("Ignoring unreadable parse cache entry %s: %s", cache_path, e)
+            return None
+    
+    def cache_documents(self, cache_key: Optional[str], documents: List[Document]):
+        """Persist parsed documents so an identical upload can skip parsing"""
+        if not cache_key or not documents:
+            return
+        cache_path = os.path.join(CONFIG["PARSE_CACHE_PATH"], f"{cache_key}.pkl")
+        try:
+            with open(cache_path, "wb") as f:
+                pickle.dump(documents, f, protocol=pickle.HIGHEST_PROTOCOL)
+            logger.debug("Cached %d documents under %s", len(documents), cache_key)
+        except Exception as e:
+            logger.warning("Could not write parse cache entry %s: %s", cache_path, e)
+            return
+        self._prune_parse_cache()
+    
+    def _prune_parse_cache(self):
+        """Delete the oldest parse cache entries beyond PARSE_CACHE_MAX_ENTRIES"""
+        cache_dir = CONFIG["PARSE_CACHE_PATH"]
+        try:
+            entries = [e for e in os.scandir(cache_dir) if e.name.endswith(".pkl")]
+            excess = len(entries) - CONFIG["PARSE_CACHE_MAX_ENTRIES"]
+            if excess <= 0:
+                return
+            entries.sort(key=lambda e: e.stat().st_mtime)
+            for entry in entries[:excess]:
+                os.remove(entry.path)
+            logger.debug("Evicted %d parse cache entries", excess)
+        except OSError as e:
+            logger.warning("Could not prune parse cache: %s", e)
+    
+    def _supported_paths(self, file_paths: List[str]) -> List[str]:
+        """Filter out files that no loader can handle"""
+        supported = []
+        for file_path in file_paths:
+            if file_extension(file_path) in LOADERS:
+                supported.append(file_path)
+            else:
+                logger.warning("Unsupported file type: %s", file_path)
+                st.warning(f"Unsupported file type: {file_path}")
+        return supported
+    
     def process_documents(self, documents: List[Document]) -> List[Document]:
         """Split documents into chunks"""
         logger.info("Processing documents into chunks")
@@ -82,7 +202,7 @@ class DocumentProcessor:
             return []
         
         chunks = self.text_splitter.split_documents(documents)
-        logger.debug(f"Split {len(documents)} documents into {len(chunks)} chunks")
+        logger.debug("Split %d documents into %d chunks", len(documents), len(chunks))
         return chunks
     
     def clear_vector_store(self):
@@ -92,15 +212,15 @@ class DocumentProcessor:
             # Delete the collection if it exists using v3 API
             if self.weaviate_client.schema.exists(self.index_name):
                 self.weaviate_client.schema.delete_class(self.index_name)
-                logger.info(f"Deleted existing Weaviate collection: {self.index_name}")
+                logger.info("Deleted existing Weaviate collection: %s", self.index_name)
             
             # Reset the vector store instance
             self.vector_store = None
+            self._clear_search_cache()
             logger.info("Vector store cleared successfully")
             
         except Exception as e:
-            logger.error(f"Error clearing vector store: {str(e)}", exc_info=True)
-            print(f"DEBUG: Error clearing vector store: {str(e)}")
+            logger.error("Error clearing vector store: %s", e, exc_info=True)
             st.error(f"Error clearing vector store: {str(e)}")
     
     def create_vector_store(self, documents: List[Document]) -> Weaviate:  # Changed return type
@@ -110,55 +230,116 @@ class DocumentProcessor:
             logger.error("No documents provided for vector store creation")
             return None
         
-        # Clear existing vector store first
+        # Chunk before dropping the old collection so a failure here leaves it usable
+        chunks = self.process_documents(documents)
         self.clear_vector_store()
         
-        chunks = self.process_documents(documents)
-        logger.info(f"Creating new vector store from {len(chunks)} chunks")
+        logger.info("Creating new vector store from %d chunks", len(chunks))
         try:
             # Always create a new vector store (no merging)
             logger.debug("Creating brand new vector store")
-            self.vector_store = Weaviate.from_documents(
-                documents=chunks,
-                embedding=self.embeddings,
-                client=self.weaviate_client,
-                index_name=self.index_name,
-                text_key="text"
-            )
-            logger.info(f"Created new vector store with {len(chunks)} chunks")
+            self._create_index_schema()
+            self.vector_store = self._index_chunks(chunks)
+            self._clear_search_cache()
+            logger.info("Created new vector store with %d chunks", len(chunks))
+            self._enable_compression(len(chunks))
             
             self.save_vector_store()
             return self.vector_store
             
         except Exception as e:
-            logger.error(f"Vector store creation failed: {str(e)}", exc_info=True)
-            print(f"DEBUG: Error creating vector store {str(e)} ")
+            logger.error("Vector store creation failed: %s", e, exc_info=True)
             st.error(f"Error creating vector store: {str(e)}")
             return None
     
+    def _create_index_schema(self):
+        """Create the Weaviate class with tuned HNSW build and search parameters"""
+        schema = {
+            "class": self.index_name,
+            "vectorizer": "none",
+            "vectorIndexType": "hnsw",
+            "vectorIndexConfig": {
+                "efConstruction": CONFIG["HNSW_EF_CONSTRUCTION"],
+                "maxConnections": CONFIG["HNSW_MAX_CONNECTIONS"],
+                "ef": CONFIG["HNSW_EF"]
+            },
+            "properties": [{"name": "text", "dataType": ["text"]}]
+        }
+        if CONFIG["VECTOR_COMPRESSION"] == "sq":
+            # Scalar (int8) quantization must be declared at creation; Weaviate trains it
+            # once the class reaches trainingLimit objects
+            schema["vectorIndexConfig"]["sq"] = {
+                "enabled": True,
+                "trainingLimit": CONFIG["VECTOR_COMPRESSION_MIN_OBJECTS"]
+            }
+        self.weaviate_client.schema.create_class(schema)
+        logger.debug("Created Weaviate class %s with HNSW config %s", self.index_name, schema['vectorIndexConfig'])
+    
+    def _index_chunks(self, chunks: List[Document]) -> Weaviate:
+        """Embed all chunks in one call and upload them with their precomputed vectors"""
+        texts = [chunk.page_content for chunk in chunks]
+        vectors = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+        logger.debug("Embedded %d chunks into a %s matrix", len(chunks), vectors.shape)
+        
+        # Batches are sent as they fill instead of as one request on exit
+        self.weaviate_client.batch.configure(batch_size=CONFIG["WEAVIATE_BATCH_SIZE"], dynamic=True)
+        with self.weaviate_client.batch as batch:
+            for chunk, vector in zip(chunks, vectors):
+                batch.add_data_object({"text": chunk.page_content, **chunk.metadata}, self.index_name, vector=vector)
+        
+        return Weaviate(
+            client=self.weaviate_client,
+            index_name=self.index_name,
+            text_key="text",
+            embedding=self.embeddings,
+            attributes=sorted({key for chunk in chunks for key in chunk.metadata}),
+            by_text=False
+        )
+    
+    def _enable_compression(self, object_count: int):
+        """Compress stored vectors with PQ once there are enough of them to train the quantizer"""
+        compression = CONFIG["VECTOR_COMPRESSION"]
+        if compression != "pq" or object_count < CONFIG["VECTOR_COMPRESSION_MIN_OBJECTS"]:
+            logger.debug("Skipping vector compression for %s objects", object_count)
+            return
+        
+        try:
+            self.weaviate_client.schema.update_config(
+                self.index_name,
+                {"vectorIndexConfig": {compression: {"enabled": True}}}
+            )
+            logger.info("Enabled %s vector compression on %s objects", compression, object_count)
+        except Exception as e:
+            # Search still works uncompressed, so this is not fatal
+            logger.warning("Could not enable vector compression: %s", e)
+    
     def save_vector_store(self):
         """Save vector store to disk"""
         if self.vector_store:
-            logger.info(f"Saving vector store to Weaviate")
+            logger.info("Saving vector store to Weaviate")
             try:
                 # Weaviate automatically persists data, no explicit save needed
                 logger.info("Vector store saved successfully (Weaviate auto-persists)")
                 st.success("Vector store created and saved successfully!")
             except Exception as e:
-                logger.error(f"Error saving vector store: {str(e)}", exc_info=True)
-                print(f"DEBUG: Error saving vector store {str(e)} ")
+                logger.error("Error saving vector store: %s", e, exc_info=True)
                 st.error(f"Error saving vector store: {str(e)}")
     
     def load_vector_store(self):
         """Load vector store from disk"""
         try:
-            logger.info(f"Loading vector store from Weaviate")
-            if self.weaviate_client.schema.exists(self.index_name):
+            logger.info("Loading vector store from Weaviate")
+            # One schema fetch both checks for the class and lists its metadata properties
+            classes = self.weaviate_client.schema.get().get("classes", [])
+            class_schema = next((c for c in classes if c["class"] == self.index_name), None)
+            if class_schema is not None:
                 self.vector_store = Weaviate(
                     client=self.weaviate_client,
                     index_name=self.index_name,
                     text_key="text",
-                    embedding=self.embeddings
+                    embedding=self.embeddings,
+                    attributes=[p["name"] for p in class_schema.get("properties", []) if p["name"] != "text"],
+                    by_text=False
                 )
                 logger.info("Vector store loaded successfully")
                 st.session_state.vector_store_loaded = True
@@ -166,29 +347,65 @@ class DocumentProcessor:
                 logger.warning("No existing Weaviate collection found")
                 self.vector_store = None
         except Exception as e:
-            logger.error(f"Error loading vector store: {str(e)}", exc_info=True)
-            print(f"DEBUG: Error occur in load_vector_store {str(e)} ")
+            logger.error("Error loading vector store: %s", e, exc_info=True)
             st.warning(f" NO vector store loaded please load it:")
             self.vector_store = None
     
     def search_documents(self, query: str, k: int = 4) -> List[Document]:
         """Search for relevant documents"""
-        logger.info(f"Document search initiated: {query[:50]}... (k={k})")
+        logger.info("Document search initiated: %s... (k=%s)", query[:50], k)
         if not self.vector_store:
             logger.warning("Search attempted with no vector store available")
             return []
         
+        cache_key = (query.strip().lower(), k)
+        with self._search_lock:
+            if cache_key in self._search_cache:
+                self._search_cache.move_to_end(cache_key)
+                logger.debug("Search cache hit")
+                return list(self._search_cache[cache_key])
+        
         try:
             docs = self.vector_store.similarity_search(query, k=k)
-            logger.debug(f"Found {len(docs)} relevant documents")
-            return docs
+            logger.debug("Found %d relevant documents", len(docs))
+            with self._search_lock:
+                self._search_cache[cache_key] = docs
+                while len(self._search_cache) > CONFIG["SEARCH_CACHE_SIZE"]:
+                    self._search_cache.popitem(last=False)
+            return list(docs)
         except Exception as e:
-            logger.error(f"Search failed: {str(e)}", exc_info=True)
-            print(f"DEBUG: Error searching document : {str(e)} ")
+            logger.error("Search failed: %s", e, exc_info=True)
             st.error(f"Error searching documents: {str(e)}")
             return []
     
+    def _clear_search_cache(self):
+        """Drop cached search results after the index changes"""
+        with self._search_lock:
+            self._search_cache.clear()
+    
+    def start_warmup(self, queries: List[str]):
+        """Embed common queries in a background thread so the first real query is not cold"""
+        if self._warmup_started:
+            return
+        self._warmup_started = True
+        threading.Thread(target=self._warm_up, args=(list(queries),), name="embedding-warmup", daemon=True).start()
+    
+    def _warm_up(self, queries: List[str]):
+        """Run the embedding model once and fill the query embedding cache"""
+        try:
+            for query in queries:
+                self.embeddings.embed_query(query)
+            logger.info("Embedding model warmed up with %d queries", len(queries))
+        except Exception as e:
+            logger.warning("Embedding warmup failed: %s", e)
+    
     def get_vector_store(self) -> Optional[Weaviate]:  # Changed return type
         """Get the current vector store"""
-        logger.debug(f"Vector store requested. Available: {self.vector_store is not None}")
+        logger.debug("Vector store requested. Available: %s", self.vector_store is not None)
         return self.vector_store
+
+
+@st.cache_resource
+def get_document_processor() -> DocumentProcessor:
+    """Shared DocumentProcessor that survives reruns and new sessions"""
+    return DocumentProcessor()
@@ -0,0 +1,18 @@
+from typing import Optional
+from langchain_groq import ChatGroq
+import streamlit as st
+import logging
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+
+@st.cache_resource
+def get_llm(model_name: str, temperature: float, api_key: Optional[str]) -> ChatGroq:
+    """Create the Groq chat client once per process so reruns and sessions reuse it"""
+    logger.info("Creating ChatGroq client for model %s", model_name)
+    return ChatGroq(
+        groq_api_key=api_key,
+        model=model_name,
+        temperature=temperature,
+    )
@@ -0,0 +1,83 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import numpy as np
+import logging
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+class SemanticCache:
+    """Caches chatbot answers keyed by the embedding of the question"""
+    def __init__(self, embeddings, threshold: float = 0.92, max_size: int = 256, ttl: float = 3600):
+        logger.info("Initializing SemanticCache")
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        # entry id -> (normalized query vector, cached value, insertion time)
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._next_id = 0
+        # Stacked vectors of all entries, rebuilt lazily after the entries change
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_ids: list = []
+        # The cache is shared by all sessions, which run on separate threads
+        self._lock = threading.Lock()
+        logger.debug("Semantic cache threshold=%s, max_size=%s, ttl=%ss", threshold, max_size, ttl)
+
+    def embed(self, query: str) -> np.ndarray:
+        """Embed and L2-normalize a query"""
+        vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, query_vector: np.ndarray) -> Optional[Dict[str, Any]]:
+        """Return the cached value of the most similar question, if close enough"""
+        with self._lock:
+            self._evict_expired()
+            if not self._entries:
+                return None
+
+            if self._matrix is None:
+                self._matrix_ids = list(self._entries.keys())
+                self._matrix = np.vstack([self._entries[i][0] for i in self._matrix_ids])
+
+            scores = self._matrix @ query_vector
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                logger.debug("Semantic cache miss (best score %.3f)", scores[best])
+                return None
+
+            entry_id = self._matrix_ids[best]
+            self._entries.move_to_end(entry_id)
+            logger.info("Semantic cache hit (score %.3f)", scores[best])
+            return self._entries[entry_id][1]
+
+    def add(self, query_vector: np.ndarray, value: Dict[str, Any]):
+        """Store a value for the given query vector"""
+        with self._lock:
+            self._entries[self._next_id] = (query_vector, value, time.monotonic())
+            self._next_id += 1
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def clear(self):
+        """Drop all cached entries"""
+        logger.info("Clearing semantic cache")
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def _evict_expired(self):
+        """Remove entries older than the TTL"""
+        if not self.ttl:
+            return
+        cutoff = time.monotonic() - self.ttl
+        expired = [i for i, (_, _, created) in self._entries.items() if created < cutoff]
+        for entry_id in expired:
+            del self._entries[entry_id]
+        if expired:
+            logger.debug("Evicted %d expired semantic cache entries", len(expired))
+            self._matrix = None
@@ -1,37 +1,86 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional
 import streamlit as st
-from conversational_form import ConversationalForm
-from validators import DateExtractor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from conversational_form import ConversationalForm, get_conversational_form
+from validators import DateExtractor, FormValidator, CALL_REQUEST_RE, CALL_REQUEST_TRIGGERS
 from config import CONFIG
-import json
+import orjson
 from datetime import datetime
-from langchain_groq import ChatGroq
+from llm import get_llm
 from langchain import hub
 from langchain.agents import AgentExecutor, create_tool_calling_agent
 
 from langchain_core.tools import Tool
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain.agents.react.agent import create_react_agent
 import logging
 import re
+import functools
+import threading
 from langchain_core.prompts import PromptTemplate
  
 # Initialize logger
 logger = logging.getLogger(__name__)
 
+# Direct call/appointment requests with context, as one alternation so each input is scanned once
+_APPOINTMENT_RE = re.compile(
+    r'\b(can you|could you|please)\s+(call|contact)\s+me\b'
+    r'|\b(schedule|book)\s+(a|an)?\s*(call|appointment|meeting)\b'
+    r'|\bi\s*(want|need|would like)\s+(to\s+)?(schedule|book)\b'
+)
+
+# One-word triggers ("appointment", "meeting") can be found with set lookups on the tokens
+_SINGLE_WORD_TRIGGERS = frozenset(t for t in CALL_REQUEST_TRIGGERS if " " not in t)
+
+
+@functools.lru_cache(maxsize=1024)
+def _keyword_match(user_input_lower: str) -> Optional[str]:
+    """Return the call/appointment phrase found in normalized input, if any"""
+    # Whole-token hits skip the regexes; the full trigger regex still catches
+    # phrases and words with punctuation or suffixes attached
+    token_hits = _SINGLE_WORD_TRIGGERS.intersection(user_input_lower.split())
+    if token_hits:
+        return next(iter(token_hits))
+    
+    # Check for exact phrase matches, then direct appointment requests with context
+    match = CALL_REQUEST_RE.search(user_input_lower) or _APPOINTMENT_RE.search(user_input_lower)
+    return match.group() if match else None
+
+
+def _as_coroutine(func):
+    """Async variant of a tool function for AgentExecutor.ainvoke"""
+    # The tools only read and write session state, so they run directly on the
+    # event loop thread, which keeps Streamlit's script context available. They never
+    # await, so several tool calls in one agent step still run one after another
+    async def coroutine(tool_input: str) -> str:
+        return func(tool_input)
+    return coroutine
+
+
+class _ScriptContextHandler(BaseCallbackHandler):
+    """Attaches the caller's Streamlit script context to the worker threads of a batch run"""
+    def __init__(self, ctx):
+        self.ctx = ctx
+    
+    def on_chain_start(self, serialized, inputs, **kwargs):
+        # Sync handlers run on the thread executing the chain, before any tool touches session state
+        if self.ctx is not None and get_script_run_ctx(suppress_warning=True) is None:
+            add_script_run_ctx(threading.current_thread(), self.ctx)
+
 
 class ToolAgents:
     """Handles tool-based agents for specialized tasks"""
     
     def __init__(self, conversational_form: ConversationalForm):
         logger.info("Initializing ToolAgents")
-        self.llm = ChatGroq(
-            groq_api_key=CONFIG["GROQ_API_KEY"],
-            model=CONFIG["MODEL_NAME"],
-            temperature=CONFIG["TEMPERATURE"],
-        )
+        self.llm = get_llm(CONFIG["MODEL_NAME"], CONFIG["TEMPERATURE"], CONFIG["GROQ_API_KEY"])
         self.conversational_form = conversational_form
         self.date_extractor = DateExtractor()
         self.tools = self._create_tools()
+        # Tools never change after construction, so their names and descriptions are built once.
+        # This instance is shared across sessions, so the getters hand out copies
+        self._tool_names = tuple(tool.name for tool in self.tools)
+        self._tool_descriptions = {tool.name: tool.description for tool in self.tools}
         self.agent = self._create_agent()
     
     def _create_tools(self) -> List[Tool]:
@@ -52,9 +101,7 @@ class ToolAgents:
                     result = self.conversational_form.process_form_input(input_text)
                     return result["response"]
             except Exception as e:
-                logger.error(f"Error processing appointment request: {str(e)}", exc_info=True)
-                print(f"DEBUG: Error process appointment request :{str(e)} ")
-
+                logger.error("Error processing appointment request: %s", e, exc_info=True)
                 return f"Error processing appointment request: {str(e)}"
         
         def extract_date_tool(date_text: str) -> str:
@@ -63,16 +110,15 @@ class ToolAgents:
             try:
                 extracted_date = self.date_extractor.extract_date(date_text)
                 if extracted_date:
-                    date_obj = datetime.strptime(extracted_date, "%Y-%m-%d")
+                    date_obj = datetime.fromisoformat(extracted_date)
                     formatted_date = date_obj.strftime("%A, %B %d, %Y")
-                    logger.debug(f"Extracted date: {extracted_date} ({formatted_date})")
+                    logger.debug("Extracted date: %s (%s)", extracted_date, formatted_date)
                     return f"Extracted date: {extracted_date} ({formatted_date})"
                 else:
                     logger.warning("Could not extract a valid date from the input")
                     return "Could not extract a valid date from the input"
             except Exception as e:
-                logger.error(f"Error extracting date: {str(e)}", exc_info=True)
-                print(f"DEBUG: Error extracting datta :{str(e)} ")
+                logger.error("Error extracting date: %s", e, exc_info=True)
                 return f"Error extracting date: {str(e)}"
         
         def get_form_status_tool(input_text: str) -> str:
@@ -90,38 +136,33 @@ class ToolAgents:
                         "current_step": current_step,
                         "collected_data": list(form_data.keys())
                     }
-                    logger.debug(f"Form status: {status}")
-                    return json.dumps(status, indent=2)
+                    logger.debug("Form status: %s", status)
+                    return orjson.dumps(status).decode()
                 else:
                     logger.debug("No form collection in progress")
-                    return json.dumps({"active": False, "message": "No form collection in progress"})
+                    return orjson.dumps({"active": False, "message": "No form collection in progress"}).decode()
             except Exception as e:
-                logger.error(f"Error getting form status: {str(e)}", exc_info=True)
-                print(f"DEBUG: Error getting form status :{str(e)} ")
+                logger.error("Error getting form status: %s", e, exc_info=True)
                 return f"Error getting form status: {str(e)}"
         
         def validate_contact_info_tool(contact_info: str) -> str:
             """Tool to validate contact information (email, phone)"""
             logger.info("validate_contact_info_tool called")
             try:
-                from validators import FormValidator
-                validator = FormValidator()
-                
                 # Try to detect what type of contact info this is
                 if "@" in contact_info:
-                    is_valid, message = validator.validate_email(contact_info)
-                    logger.debug(f"Email validation: {message}")
+                    is_valid, message = FormValidator.validate_email(contact_info)
+                    logger.debug("Email validation: %s", message)
                     return f"Email validation: {message}"
                 elif any(char.isdigit() for char in contact_info):
-                    is_valid, message = validator.validate_phone(contact_info)
-                    logger.debug(f"Phone validation: {message}")
+                    is_valid, message = FormValidator.validate_phone(contact_info)
+                    logger.debug("Phone validation: %s", message)
                     return f"Phone validation: {message}"
                 else:
                     logger.warning("Unable to determine contact info type")
                     return "Unable to determine contact info type. Please provide email or phone number."
             except Exception as e:
-                logger.error(f"Error validating contact info: {str(e)}", exc_info=True)
-                print(f"DEBUG: Error validating contact infor :{str(e)} ")
+                logger.error("Error validating contact info: %s", e, exc_info=True)
                 return f"Error validating contact info: {str(e)}"
         
         def get_completed_appointments_tool(input_text: str) -> str:
@@ -144,39 +185,43 @@ class ToolAgents:
                         "requested": form.get("timestamp", "N/A")[:19] if form.get("timestamp") else "N/A"
                     }
                     appointments_info.append(appointment)
-                logger.debug(f"Returning {len(appointments_info)} completed appointments")
+                logger.debug("Returning %d completed appointments", len(appointments_info))
                 
-                return json.dumps({"appointments": appointments_info}, indent=2)
+                return orjson.dumps({"appointments": appointments_info}).decode()
             except Exception as e:
-                logger.error(f"Error retrieving appointments: {str(e)}", exc_info=True)
-                print(f"DEBUG: Error retrieving appointments :{str(e)} ")
+                logger.error("Error retrieving appointments: %s", e, exc_info=True)
                 return f"Error retrieving appointments: {str(e)}"
 
         return [
             Tool(
                 name="schedule_appointment",
                 description="Use this tool when user wants to schedule a call, book an appointment, or provide contact information during form collection. Input should be the user's message.",
-                func=schedule_appointment_tool
+                func=schedule_appointment_tool,
+                coroutine=_as_coroutine(schedule_appointment_tool)
             ),
             Tool(
                 name="extract_date",
                 description="Use this tool to extract and normalize dates from natural language input like 'tomorrow', 'next Monday', or specific dates.",
-                func=extract_date_tool
+                func=extract_date_tool,
+                coroutine=_as_coroutine(extract_date_tool)
             ),
             Tool(
                 name="get_form_status",
                 description="Use this tool to check the current status of form collection process.",
-                func=get_form_status_tool
+                func=get_form_status_tool,
+                coroutine=_as_coroutine(get_form_status_tool)
             ),
             Tool(
                 name="validate_contact_info",
                 description="Use this tool to validate email addresses or phone numbers.",
-                func=validate_contact_info_tool
+                func=validate_contact_info_tool,
+                coroutine=_as_coroutine(validate_contact_info_tool)
             ),
             Tool(
                 name="get_completed_appointments",
                 description="Use this tool to retrieve information about completed appointments.",
-                func=get_completed_appointments_tool
+                func=get_completed_appointments_tool,
+                coroutine=_as_coroutine(get_completed_appointments_tool)
             )
         ]
     
@@ -201,52 +246,33 @@ class ToolAgents:
                 tools=self.tools,
                 verbose=True,
                 handle_parsing_errors=True,
-                max_iterations=15
+                # Bound worst-case round trips and wall-clock time per turn
+                max_iterations=CONFIG["AGENT_MAX_ITERATIONS"],
+                max_execution_time=CONFIG["AGENT_MAX_EXECUTION_TIME"],
+                early_stopping_method="force"
             )
             logger.info("Agent executor created successfully")
             return agent_executor
             
         except Exception as e:
-            logger.error(f"Error creating agent: {str(e)}", exc_info=True)
-            print(f"DEBUG: Error creating agent :{str(e)} ")
+            logger.error("Error creating agent: %s", e, exc_info=True)
             st.error(f"Error creating agent: {str(e)}")
             return None
     
     def should_use_agent(self, user_input: str) -> bool:
         """Determine if we should use the agent for this input - more precise triggers"""
-        logger.debug(f"Checking if agent should be used for input: {user_input[:50]}...")
+        logger.debug("Checking if agent should be used for input: %s...", user_input[:50])
         
         # If form is already active, always use agent
         if self.conversational_form.is_form_active():
             logger.debug("Form is active, using agent")
             return True
         
-        # More specific appointment/scheduling keywords
-        appointment_triggers = [
-            'call me', 'call back', 'schedule call', 'book appointment',
-            'appointment', 'meeting', 'talk to someone', 'speak with',
-            'contact me', 'get in touch', 'schedule meeting'
-        ]
-        
-        user_input_lower = user_input.lower().strip()
-        
-        # Check for exact phrase matches or patterns
-        for trigger in appointment_triggers:
-            if trigger in user_input_lower:
-                logger.debug(f"Appointment trigger matched: {trigger}")
-                return True
-        
-        # Check for direct appointment requests with context
-        appointment_patterns = [
-            r'\b(can you|could you|please)\s+(call|contact)\s+me\b',
-            r'\b(schedule|book)\s+(a|an)?\s*(call|appointment|meeting)\b',
-            r'\bi\s*(want|need|would like)\s+(to\s+)?(schedule|book)\b'
-        ]
-        
-        for pattern in appointment_patterns:
-            if re.search(pattern, user_input_lower):
-                logger.debug(f"Appointment pattern matched: {pattern}")
-                return True
+        # The keyword check only depends on the text, so it is cached; form state above is not
+        matched = _keyword_match(user_input.lower().strip())
+        if matched:
+            logger.debug("Appointment trigger matched: %s", matched)
+            return True
         
         logger.debug("No agent triggers found")
         return False
@@ -254,71 +280,182 @@ class ToolAgents:
     
     def process_with_agent(self, user_input: str) -> Dict[str, Any]:
         """Process user input using the agent"""
-        logger.info(f"Processing input with agent: {user_input[:50]}...")
+        logger.info("Processing input with agent: %s...", user_input[:50])
         try:
-            if not self.agent:
-                logger.warning("Agent not available")
-                return {
-                    "response": "Agent is not available. Please try again later.",
-                    "tool_used": None,
-                    "success": False
-                }
-            
-            # If form is active, always use the appointment tool
-            if self.conversational_form.is_form_active():
-                logger.debug("Form is active, using schedule_appointment tool")
-                result = self.conversational_form.process_form_input(user_input)
-                return {
-                    "response": result["response"],
-                    "tool_used": "schedule_appointment",
-                    "success": True,
-                    "form_completed": result.get("form_completed", False)
-                }
+            early_result = self._handle_without_agent(user_input)
+            if early_result is not None:
+                return early_result
             logger.debug("Invoking agent for input")
             # Use agent to process the input
             result = self.agent.invoke({
                 "input": user_input,
                 "chat_history": ""
             })
-            logger.info("Agent processed input successfully")
-            return {
-                "response": result["output"],
-                "tool_used": "agent",
-                "success": True
-            }
+            return self._agent_response(result)
             
         except Exception as e:
-            logger.error(f"Error processing user request: {str(e)}", exc_info=True)
-            print(f"DEBUG: Error user request :{str(e)} ")
-            error_msg = f"I encountered an error while processing your request: {str(e)}"
+            return self._handle_agent_error(user_input, e)
+    
+    def stream_with_agent(self, user_input: str) -> Iterator[str]:
+        """Yield the response as the agent produces it, for st.write_stream"""
+        logger.info("Streaming input with agent: %s...", user_input[:50])
+        try:
+            early_result = self._handle_without_agent(user_input)
+            if early_result is not None:
+                # Nothing to stream for input that belongs to the RAG chatbot
+                if early_result.get("route") != "rag":
+                    yield early_result["response"]
+                return
+            # AgentExecutor streams per step; the answer is in the chunk carrying "output"
+            for chunk in self.agent.stream({
+                "input": user_input,
+                "chat_history": ""
+            }):
+                if "output" in chunk:
+                    yield chunk["output"]
+            logger.info("Agent streamed response successfully")
             
-            # Fallback: if it looks like an appointment request, try to handle it directly
-            if any(keyword in user_input.lower() for keyword in ['call', 'appointment', 'schedule', 'book']):
-                try:
-                    logger.debug("Fallback: initializing form due to error")
-                    result = self.conversational_form.initialize_form()
-                    return {
-                        "response": result["response"],
-                        "tool_used": "schedule_appointment_fallback",
-                        "success": True
-                    }
-                except Exception as inner_e:
-                    logger.error(f"Error in fallback form initialization: {str(inner_e)}", exc_info=True)
+        except Exception as e:
+            yield self._handle_agent_error(user_input, e)["response"]
+    
+    async def aprocess_with_agent(self, user_input: str) -> Dict[str, Any]:
+        """Async variant of process_with_agent for callers that already run an event loop"""
+        logger.info("Processing input with agent (async): %s...", user_input[:50])
+        try:
+            early_result = self._handle_without_agent(user_input)
+            if early_result is not None:
+                return early_result
+            logger.debug("Invoking agent asynchronously for input")
+            result = await self.agent.ainvoke({
+                "input": user_input,
+                "chat_history": ""
+            })
+            return self._agent_response(result)
             
+        except Exception as e:
+            return self._handle_agent_error(user_input, e)
+    
+    def process_batch(self, inputs: List[str]) -> List[Dict[str, Any]]:
+        """Process several inputs in order, sending those that need the agent as one batch"""
+        logger.info("Processing %d inputs as a batch", len(inputs))
+        results, pending, batch_kwargs = self._prepare_batch(inputs)
+        outputs = self.agent.batch(**batch_kwargs) if pending else []
+        return self._collect_batch(inputs, results, pending, outputs)
+    
+    async def aprocess_batch(self, inputs: List[str]) -> List[Dict[str, Any]]:
+        """Async variant of process_batch using AgentExecutor.abatch"""
+        logger.info("Processing %d inputs as an async batch", len(inputs))
+        results, pending, batch_kwargs = self._prepare_batch(inputs)
+        outputs = await self.agent.abatch(**batch_kwargs) if pending else []
+        return self._collect_batch(inputs, results, pending, outputs)
+    
+    def _prepare_batch(self, inputs: List[str]) -> tuple:
+        """Answer inputs that skip the agent and build the batch call for the rest"""
+        # Form answers are consumed in order, so these run one by one before the batch
+        results = [self._handle_without_agent(user_input) for user_input in inputs]
+        pending = [i for i, result in enumerate(results) if result is None]
+        
+        # Every input of a call inside a Streamlit session shares that session's form
+        # state, which concurrent tool calls would update in no defined order. Such
+        # batches run one input at a time; only callers outside a session run concurrently.
+        ctx = get_script_run_ctx(suppress_warning=True)
+        max_concurrency = 1 if ctx is not None else CONFIG["AGENT_MAX_CONCURRENCY"]
+        batch_kwargs = {
+            "inputs": [{"input": inputs[i], "chat_history": ""} for i in pending],
+            "config": {
+                "max_concurrency": max_concurrency,
+                "callbacks": [_ScriptContextHandler(ctx)]
+            },
+            "return_exceptions": True
+        }
+        return results, pending, batch_kwargs
+    
+    def _collect_batch(self, inputs: List[str], results: List[Optional[Dict[str, Any]]],
+                       pending: List[int], outputs: List[Any]) -> List[Dict[str, Any]]:
+        """Fill in the responses of the batched inputs"""
+        for i, output in zip(pending, outputs):
+            results[i] = self._batch_result(inputs[i], output)
+        return results
+    
+    def _batch_result(self, user_input: str, output: Any) -> Dict[str, Any]:
+        """Turn one batch output, which may be an exception, into a response dict"""
+        if isinstance(output, Exception):
+            return self._handle_agent_error(user_input, output)
+        return self._agent_response(output)
+    
+    def _handle_without_agent(self, user_input: str) -> Optional[Dict[str, Any]]:
+        """Return a response when the agent is not needed, unavailable or the form is active, else None"""
+        # Not an appointment request: skip the LLM round trip and send the caller to the RAG chatbot
+        if not self.should_use_agent(user_input):
+            logger.debug("No agent triggers, routing to RAG")
+            return {
+                "response": None,
+                "tool_used": None,
+                "success": False,
+                "route": "rag"
+            }
+        
+        if not self.agent:
+            logger.warning("Agent not available")
             return {
-                "response": error_msg,
+                "response": "Agent is not available. Please try again later.",
                 "tool_used": None,
                 "success": False
             }
+        
+        # If form is active, always use the appointment tool
+        if self.conversational_form.is_form_active():
+            logger.debug("Form is active, using schedule_appointment tool")
+            result = self.conversational_form.process_form_input(user_input)
+            return {
+                "response": result["response"],
+                "tool_used": "schedule_appointment",
+                "success": True,
+                "form_completed": result.get("form_completed", False)
+            }
+        return None
+    
+    def _agent_response(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Wrap the agent executor output"""
+        logger.info("Agent processed input successfully")
+        return {
+            "response": result["output"],
+            "tool_used": "agent",
+            "success": True
+        }
+    
+    def _handle_agent_error(self, user_input: str, e: Exception) -> Dict[str, Any]:
+        """Report an agent failure, falling back to the form for appointment-like input"""
+        logger.error("Error processing user request: %s", e, exc_info=e)
+        error_msg = f"I encountered an error while processing your request: {str(e)}"
+        
+        # Fallback: if it looks like an appointment request, try to handle it directly
+        if any(keyword in user_input.lower() for keyword in ['call', 'appointment', 'schedule', 'book']):
+            try:
+                logger.debug("Fallback: initializing form due to error")
+                result = self.conversational_form.initialize_form()
+                return {
+                    "response": result["response"],
+                    "tool_used": "schedule_appointment_fallback",
+                    "success": True
+                }
+            except Exception as inner_e:
+                logger.error("Error in fallback form initialization: %s", inner_e, exc_info=True)
+        
+        return {
+            "response": error_msg,
+            "tool_used": None,
+            "success": False
+        }
     
     def get_available_tools(self) -> List[str]:
         """Get list of available tool names"""
         logger.debug("Getting available tool names")
-        return [tool.name for tool in self.tools]
+        return list(self._tool_names)
     
     def get_tool_descriptions(self) -> Dict[str, str]:
         """Get descriptions of all available tools"""
-        return {tool.name: tool.description for tool in self.tools}
+        return dict(self._tool_descriptions)
     
     def reset_agent_state(self):
         """Reset any persistent agent state if needed"""
@@ -326,12 +463,12 @@ class ToolAgents:
         try:
             # Reset form state if needed
             if hasattr(self, 'conversational_form'):
-                st.session_state.collecting_form = False
-                st.session_state.form_step = None
-                st.session_state.form_data = {}
+                defaults = {"collecting_form": False, "form_step": None, "form_data": {}}
+                # One update, and none at all when the form is already reset
+                if any(st.session_state.get(key) != value for key, value in defaults.items()):
+                    st.session_state.update(defaults)
         except Exception as e:
-            logger.error(f"Error resetting agent state: {str(e)}", exc_info=True)
-            print(f"DEBUG: Error resetting agent states :{str(e)} ")
+            logger.error("Error resetting agent state: %s", e, exc_info=True)
             st.error(f"Error resetting agent state: {str(e)}")
     
     def _create_custom_prompt(self) -> PromptTemplate:
@@ -360,3 +497,13 @@ class ToolAgents:
     Thought:{agent_scratchpad}"""
 
         return PromptTemplate.from_template(template)
+
+
+@st.cache_resource
+def get_tool_agents() -> ToolAgents:
+    """Shared ToolAgents with one agent executor; the tools read per-user state from st.session_state"""
+    tool_agents = ToolAgents(get_conversational_form())
+    if tool_agents.agent is None:
+        # cache_resource does not cache exceptions, so the next session retries the build
+        raise RuntimeError("Agent executor could not be created")
+    return tool_agents
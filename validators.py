@@ -1,9 +1,59 @@
 import re
-from datetime import datetime, timedelta
-import dateutil.parser
-from dateutil.relativedelta import relativedelta
+import functools
+from datetime import date, datetime, timedelta
 from typing import Tuple, Optional
 
+# Patterns compiled once at import
+NAME_RE = re.compile(r'^[a-zA-Z\s]+$')
+EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+# Deletion table for phone formatting characters, applied in one C-level pass. It covers
+# every character str.isspace() accepts (the same set as a str regex \s, all at or
+# below U+3000), so non-breaking and other Unicode spaces are stripped too
+PHONE_SEPARATORS = str.maketrans('', '', ''.join(
+    c for c in map(chr, range(0x3001)) if c.isspace()
+) + '-().')
+PHONE_DIGITS_RE = re.compile(r'\d{10,}')
+
+# Phrases that mean the user wants a call or appointment, shared by the chatbot and agent routing
+CALL_REQUEST_TRIGGERS = (
+    "call me", "call back", "schedule call", "book appointment", "appointment", "meeting",
+    "talk to someone", "speak with", "contact me", "get in touch", "schedule meeting"
+)
+# One alternation over all triggers, so the input is swept once instead of once per phrase
+CALL_REQUEST_RE = re.compile("|".join(map(re.escape, CALL_REQUEST_TRIGGERS)), re.IGNORECASE)
+
+# Relative date keywords, checked before weekday names
+_RELATIVE_DATE_RE = re.compile(r'today|tomorrow|yesterday|next week|next month')
+_WEEKDAY_RE = re.compile(r'monday|tuesday|wednesday|thursday|friday|saturday|sunday')
+_WEEKDAYS = {
+    'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3,
+    'friday': 4, 'saturday': 5, 'sunday': 6
+}
+
+
+def _next_month(day: date) -> date:
+    """Same day next month, clamped to the month's end"""
+    from dateutil.relativedelta import relativedelta
+    return day + relativedelta(months=1)
+
+
+_RELATIVE_DATES = {
+    'today': lambda day: day,
+    'tomorrow': lambda day: day + timedelta(days=1),
+    'yesterday': lambda day: day - timedelta(days=1),
+    'next week': lambda day: day + timedelta(weeks=1),
+    'next month': _next_month
+}
+
+# Explicit date formats, tried in order before falling back to fuzzy parsing
+_DATE_PATTERNS = tuple((re.compile(p), fmt) for p, fmt in (
+    (r'\d{4}-\d{2}-\d{2}', "%Y-%m-%d"),  # YYYY-MM-DD
+    (r'\d{2}/\d{2}/\d{4}', "%m/%d/%Y"),  # MM/DD/YYYY
+    (r'\d{2}-\d{2}-\d{4}', "%m-%d-%Y"),  # MM-DD-YYYY
+    (r'\d{1,2}/\d{1,2}/\d{4}', "%m/%d/%Y"),  # M/D/YYYY
+))
+_DIGIT_RE = re.compile(r'\d')
+
 class FormValidator:
     """Handles validation for user input forms"""
     
@@ -13,7 +63,7 @@ class FormValidator:
         if not name or len(name.strip()) < 2:
             return False, "Name must be at least 2 characters long"
         
-        if not re.match(r'^[a-zA-Z\s]+$', name.strip()):
+        if not NAME_RE.match(name.strip()):
             return False, "Name should only contain letters and spaces"
         
         return True, "Valid name"
@@ -21,10 +71,10 @@ class FormValidator:
     def validate_phone(phone: str) -> Tuple[bool, str]:
         """Validate phone number input using regex and digit count only"""
         # Remove common formatting characters
-        cleaned_phone = re.sub(r'[\s\-\(\)\.]+', '', phone.strip())
+        cleaned_phone = phone.translate(PHONE_SEPARATORS)
 
         # Check if the cleaned phone contains only digits and is at least 10 digits long
-        if cleaned_phone.isdigit() and len(cleaned_phone) >= 10:
+        if PHONE_DIGITS_RE.fullmatch(cleaned_phone):
             return True, f"Valid phone number: {cleaned_phone}"
         else:
             return False, "Invalid phone number"
@@ -34,78 +84,60 @@ class FormValidator:
         """Validate email input using regex only"""
         email = email.strip()
         
-        # Basic email regex pattern
-        pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        
-        if re.match(pattern, email):
+        if EMAIL_RE.match(email):
             return True, "Valid email"
         else:
             return False, "Invalid email: does not match email format"
     
 
 
+@functools.lru_cache(maxsize=512)
+def _extract_date_cached(text: str, today_ordinal: int) -> Optional[str]:
+    """extract_date on normalized text; today's ordinal is part of the key so results expire at midnight"""
+    today = date.fromordinal(today_ordinal)
+    
+    # Handle relative dates ("today", "next week", ...) with one regex sweep
+    relative_match = _RELATIVE_DATE_RE.search(text)
+    if relative_match:
+        return _RELATIVE_DATES[relative_match.group()](today).strftime("%Y-%m-%d")
+    
+    # Handle day names
+    weekday_match = _WEEKDAY_RE.search(text)
+    if weekday_match:
+        days_ahead = _WEEKDAYS[weekday_match.group()] - today.weekday()
+        if "next" in text or days_ahead <= 0:
+            days_ahead += 7
+        return (today + timedelta(days=days_ahead)).strftime("%Y-%m-%d")
+    
+    # Anything left needs numbers; this skips the slow fuzzy parse for ordinary chat
+    if not _DIGIT_RE.search(text):
+        return None
+    
+    # Try to parse specific dates with their explicit formats
+    for pattern, date_format in _DATE_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            try:
+                return datetime.strptime(match.group(), date_format).strftime("%Y-%m-%d")
+            except ValueError:
+                continue
+    
+    # dateutil is imported on first use; the routing code imports this module at startup
+    import dateutil.parser
+    
+    try:
+        # Try general parsing
+        parsed_date = dateutil.parser.parse(text, fuzzy=True)
+    except (ValueError, OverflowError):
+        # dateutil's ParserError is a ValueError; OverflowError covers out-of-range numbers
+        return None
+    return parsed_date.strftime("%Y-%m-%d")
+
+
 class DateExtractor:
     """Extract and normalize dates from natural language"""
     
     @staticmethod
     def extract_date(text: str) -> Optional[str]:
         """Extract date from natural language and return in YYYY-MM-DD format"""
-        text = text.lower().strip()
-        today = datetime.now().date()
-        
-        # Handle relative dates
-        if "today" in text:
-            return today.strftime("%Y-%m-%d")
-        
-        if "tomorrow" in text:
-            return (today + timedelta(days=1)).strftime("%Y-%m-%d")
-        
-        if "yesterday" in text:
-            return (today - timedelta(days=1)).strftime("%Y-%m-%d")
-        
-        # Handle "next" patterns
-        if "next week" in text:
-            return (today + timedelta(weeks=1)).strftime("%Y-%m-%d")
-        
-        if "next month" in text:
-            return (today + relativedelta(months=1)).strftime("%Y-%m-%d")
-        
-        # Handle day names
-        weekdays = {
-            'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3,
-            'friday': 4, 'saturday': 5, 'sunday': 6
-        }
-        
-        for day_name, day_num in weekdays.items():
-            if day_name in text:
-                days_ahead = day_num - today.weekday()
-                if "next" in text or days_ahead <= 0:
-                    days_ahead += 7
-                target_date = today + timedelta(days=days_ahead)
-                return target_date.strftime("%Y-%m-%d")
-        
-        # Try to parse specific dates
-        try:
-            # Common date patterns
-            date_patterns = [
-                r'\d{4}-\d{2}-\d{2}',  # YYYY-MM-DD
-                r'\d{2}/\d{2}/\d{4}',  # MM/DD/YYYY
-                r'\d{2}-\d{2}-\d{4}',  # MM-DD-YYYY
-                r'\d{1,2}/\d{1,2}/\d{4}',  # M/D/YYYY
-            ]
-            
-            for pattern in date_patterns:
-                match = re.search(pattern, text)
-                if match:
-                    try:
-                        parsed_date = dateutil.parser.parse(match.group())
-                        return parsed_date.strftime("%Y-%m-%d")
-                    except:
-                        continue
-            
-            # Try general parsing
-            parsed_date = dateutil.parser.parse(text, fuzzy=True)
-            return parsed_date.strftime("%Y-%m-%d")
-            
-        except:
-            return None
\ No newline at end of file
+        return _extract_date_cached(text.lower().strip(), datetime.now().date().toordinal())